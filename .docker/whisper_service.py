@@ -5,9 +5,16 @@ Expone una API REST para transcribir archivos de audio
 """
 
 import os
+import re
 import tempfile
 import subprocess
-from typing import Optional, Dict, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Optional, Dict, Any, List
+import numpy as np
+import requests
+import torch
 import whisper
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.responses import JSONResponse
@@ -15,6 +22,15 @@ import uvicorn
 from datetime import datetime
 import logging
 
+try:
+    from faster_whisper import WhisperModel
+except ImportError:  # Opcional: solo necesario con WHISPER_BACKEND=faster-whisper
+    WhisperModel = None
+try:
+    from faster_whisper import BatchedInferencePipeline
+except ImportError:  # faster-whisper < 1.1 no incluye el pipeline por lotes
+    BatchedInferencePipeline = None
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,16 +46,121 @@ app = FastAPI(
 WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'large')
 WHISPER_CACHE_DIR = os.getenv('WHISPER_CACHE_DIR', '/app/models')
 PORT = int(os.getenv('PORT', 8000))
+# Cuantización dinámica int8 de las capas Linear (solo aplica en CPU). Desactivada por
+# defecto: cambia la numérica del modelo y puede alterar las transcripciones
+WHISPER_QUANTIZE_INT8 = os.getenv('WHISPER_QUANTIZE_INT8', 'false').lower() == 'true'
+# CPUs a los que se fija el proceso, p. ej. '0-5' o '0,2,4' (vacío = sin fijar). Deja los
+# demás núcleos libres para los contenedores de descarga y decodificación del mismo host
+WHISPER_CPU_AFFINITY = os.getenv('WHISPER_CPU_AFFINITY', '').strip()
+# Hilos inter-operación de torch: el encoder/decoder se ejecuta operación a operación,
+# así que un solo hilo evita que compitan con los hilos intra-operación
+WHISPER_INTEROP_THREADS = int(os.getenv('WHISPER_INTEROP_THREADS', 1))
+
+
+def _apply_cpu_affinity(spec: str) -> int:
+    """Fija el proceso a los CPUs de spec y devuelve cuántos CPUs puede usar"""
+    if spec and hasattr(os, 'sched_setaffinity'):
+        cpus = set()
+        for part in spec.split(','):
+            start, _, end = part.strip().partition('-')
+            cpus.update(range(int(start), int(end or start) + 1))
+        os.sched_setaffinity(0, cpus)
+    if hasattr(os, 'sched_getaffinity'):
+        # Respeta también los límites de cpuset del contenedor
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+_AVAILABLE_CPUS = _apply_cpu_affinity(WHISPER_CPU_AFFINITY)
+# Hilos de inferencia en CPU. Sin definir se respeta el valor por defecto de torch /
+# CTranslate2 (núcleos físicos u OMP_NUM_THREADS); con WHISPER_CPU_AFFINITY se usan
+# los CPUs fijados. None = no se fija
+_cpu_threads_env = os.getenv('WHISPER_CPU_THREADS', '').strip()
+if _cpu_threads_env:
+    WHISPER_CPU_THREADS = max(1, int(_cpu_threads_env))
+elif WHISPER_CPU_AFFINITY:
+    WHISPER_CPU_THREADS = _AVAILABLE_CPUS
+else:
+    WHISPER_CPU_THREADS = None
+# Backend de inferencia: 'openai' (PyTorch de referencia) o 'faster-whisper' (CTranslate2)
+WHISPER_BACKEND = os.getenv('WHISPER_BACKEND', 'openai').lower()
+# Tipo de cómputo de CTranslate2 ('auto' elige int8_float16 en GPU con Tensor Cores,
+# int8_bfloat16 en CPU con AVX512-BF16 e int8 en otro caso)
+WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', 'auto')
+# Fragmentos de audio decodificados por pasada del modelo (solo faster-whisper; 1 = sin lotes)
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', 1))
+# Filtro VAD (Silero) de faster-whisper: no se pasa por el encoder el audio sin voz
+WHISPER_VAD_FILTER = os.getenv('WHISPER_VAD_FILTER', 'true').lower() == 'true'
+# Audios de /transcribe-batch que ffmpeg decodifica por adelantado mientras el modelo transcribe
+WHISPER_DECODE_PREFETCH = int(os.getenv('WHISPER_DECODE_PREFETCH', 2))
+# Compilar el encoder con torch.compile en GPU (openai-whisper; la primera llamada tarda más)
+WHISPER_TORCH_COMPILE = os.getenv('WHISPER_TORCH_COMPILE', 'false').lower() == 'true'
+# Precisión de openai-whisper en GPU: 'auto' (fp16 con Tensor Cores), 'fp16' o 'fp32'; en CPU siempre fp32
+WHISPER_PRECISION = os.getenv('WHISPER_PRECISION', 'auto').lower()
+
+# Parámetros de decodificación comunes a todas las llamadas a model.transcribe
+# (fp16 se decide al cargar el modelo según el dispositivo)
+WHISPER_DECODE_OPTIONS = {
+    'verbose': False,
+    'temperature': 0.0,
+    'best_of': 1,
+    'beam_size': 1,
+    'patience': 1.0,
+    'suppress_tokens': [-1],
+    'no_speech_threshold': 0.6,
+    'compression_ratio_threshold': 2.4,
+}
+
+# faster-whisper acepta los mismos parámetros salvo verbose (la precisión va en compute_type)
+FASTER_WHISPER_DECODE_OPTIONS = {
+    key: value for key, value in WHISPER_DECODE_OPTIONS.items() if key != 'verbose'
+}
+
+# Patrones de _apply_basic_formatting, compilados una sola vez
+_WHITESPACE_RE = re.compile(r'\s+')
+_QUESTION_RE = re.compile(
+    r'(\b(qué|quién|quiénes|cuál|cuáles|cómo|cuándo|dónde|por qué|para qué|cuánto|cuánta|cuántos|cuántas)\b[^.!?]*)',
+    re.IGNORECASE
+)
+# Raíces que aparecen en toda coincidencia posible de _QUESTION_RE; si ninguna
+# está en el texto (caso habitual) se omite el escaneo con la expresión regular
+_QUESTION_TRIGGERS = ('qué', 'quién', 'cuál', 'cómo', 'cuándo', 'dónde', 'cuánt')
+# Quita el espacio antes de la puntuación y deja exactamente uno después, en una pasada
+_PUNCT_SPACING_RE = re.compile(r'\s*([.,!?;:])\s*')
 
 # Cache del modelo
 model_cache = None
 
+@lru_cache(maxsize=8192)
+def _format_whole_seconds(total_seconds: int) -> str:
+    """Formatea segundos enteros como MM:SS (memoizado: los timestamps se repiten)"""
+    minutes, seconds = divmod(total_seconds, 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
 class WhisperService:
     def __init__(self):
         self.model = None
         self.model_name = None
+        self.device = None
+        self.compute_type = None
+        self.batched_pipeline = None
+        self.fp16 = False
+        self._configure_torch()
         self._load_model()
     
+    def _configure_torch(self):
+        """Fija los hilos de torch y desactiva autograd (el servicio solo infiere)"""
+        if WHISPER_CPU_THREADS is not None:
+            torch.set_num_threads(WHISPER_CPU_THREADS)
+        try:
+            torch.set_num_interop_threads(max(1, WHISPER_INTEROP_THREADS))
+        except RuntimeError as e:
+            # Solo puede fijarse antes de la primera operación paralela
+            logger.warning(f"⚠️ No se pudieron fijar los hilos inter-operación: {e}")
+        torch.set_grad_enabled(False)
+        logger.info(f"🧵 Hilos de torch: {torch.get_num_threads()} intra-op, "
+                    f"{torch.get_num_interop_threads()} inter-op, {_AVAILABLE_CPUS} CPUs disponibles")
+    
     def _load_model(self):
         """Carga el modelo de Whisper"""
         global model_cache
@@ -53,15 +174,28 @@ class WhisperService:
                 os.makedirs(WHISPER_CACHE_DIR, exist_ok=True)
                 
                 # Cargar modelo
-                self.model = whisper.load_model(
-                    WHISPER_MODEL, 
-                    download_root=WHISPER_CACHE_DIR
-                )
+                if WHISPER_BACKEND == 'faster-whisper':
+                    self._load_faster_whisper_model()
+                else:
+                    self._prefetch_checkpoint()
+                    self.model = whisper.load_model(
+                        WHISPER_MODEL, 
+                        download_root=WHISPER_CACHE_DIR
+                    )
+                    self.device = str(self.model.device)
+                    self.fp16 = self._use_fp16()
+                    
+                    if WHISPER_QUANTIZE_INT8 and self.model.device.type == 'cpu':
+                        self._quantize_model()
+                    elif WHISPER_TORCH_COMPILE and self.model.device.type == 'cuda':
+                        self._compile_encoder()
+                    self.compute_type = self.compute_type or ('float16' if self.fp16 else 'float32')
                 self.model_name = WHISPER_MODEL
+                
                 model_cache = self
                 
                 logger.info(f"✅ Modelo {WHISPER_MODEL} cargado exitosamente")
-                logger.info(f"📊 Dispositivo: {self.model.device}")
+                logger.info(f"📊 Dispositivo: {self.device}")
                 
             except Exception as e:
                 logger.error(f"❌ Error cargando modelo: {e}")
@@ -69,68 +203,185 @@ class WhisperService:
         else:
             self.model = model_cache.model
             self.model_name = model_cache.model_name
+            self.device = model_cache.device
+            self.compute_type = model_cache.compute_type
+            self.batched_pipeline = model_cache.batched_pipeline
+            self.fp16 = model_cache.fp16
             logger.info("🔄 Usando modelo del cache")
     
-    def convert_audio_format(self, input_path: str, output_path: str) -> bool:
-        """Convierte audio a formato WAV estándar"""
+    @staticmethod
+    def _cpu_supports_bf16() -> bool:
+        """Indica si la CPU tiene instrucciones AVX512-BF16 (según /proc/cpuinfo)"""
         try:
-            cmd = [
-                'ffmpeg',
-                '-i', input_path,
-                '-af', 'aresample=resampler=soxr:precision=28:cheby=1,volume=1.0,highpass=f=80,lowpass=f=8000',
-                '-acodec', 'pcm_s16le',
-                '-ac', '1',
-                '-ar', '16000',
-                '-sample_fmt', 's16',
-                '-f', 'wav',
-                '-y', output_path
-            ]
-            
-            logger.info("🔄 Convirtiendo audio...")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            with open('/proc/cpuinfo') as f:
+                for line in f:
+                    if line.startswith('flags'):
+                        return 'avx512_bf16' in line.split()
+        except OSError:
+            pass
+        return False
+    
+    def _prefetch_checkpoint(self):
+        """Pide al kernel que lea el checkpoint a page cache antes de que load_model lo abra"""
+        # load_model lee el archivo completo dos veces (verificación SHA256 y
+        # torch.load); POSIX_FADV_WILLNEED lanza la lectura anticipada en segundo
+        # plano con peticiones grandes en lugar de depender del readahead por bloques
+        url = whisper._MODELS.get(WHISPER_MODEL)
+        checkpoint_path = os.path.join(WHISPER_CACHE_DIR, os.path.basename(url)) if url else WHISPER_MODEL
+        if not hasattr(os, 'posix_fadvise') or not os.path.isfile(checkpoint_path):
+            return
+        
+        fd = os.open(checkpoint_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+        logger.info(f"📥 Precargando checkpoint: {checkpoint_path}")
+    
+    def _load_faster_whisper_model(self):
+        """Carga el modelo con CTranslate2 (kernels GEMM int8 y atención fusionada)"""
+        if WhisperModel is None:
+            raise RuntimeError("WHISPER_BACKEND=faster-whisper requiere el paquete faster-whisper")
+        
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.compute_type = WHISPER_COMPUTE_TYPE
+        if self.compute_type == 'auto':
+            # int8_float16 solo compensa con Tensor Cores (compute capability >= 7.0)
+            if self.device == 'cuda':
+                has_tensor_cores = torch.cuda.get_device_capability()[0] >= 7
+                self.compute_type = 'int8_float16' if has_tensor_cores else 'int8'
+            else:
+                # En CPU fp16 pierde por las conversiones; bf16 solo con soporte nativo
+                self.compute_type = 'int8_bfloat16' if self._cpu_supports_bf16() else 'int8'
+        
+        self.model = WhisperModel(
+            WHISPER_MODEL,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=WHISPER_CPU_THREADS or 0,  # 0 = valor por defecto de CTranslate2
+            download_root=WHISPER_CACHE_DIR
+        )
+        logger.info(f"⚡ Backend faster-whisper ({self.compute_type})")
+        
+        if WHISPER_BATCH_SIZE > 1:
+            if BatchedInferencePipeline is None:
+                raise RuntimeError("WHISPER_BATCH_SIZE > 1 requiere faster-whisper >= 1.1")
+            self.batched_pipeline = BatchedInferencePipeline(model=self.model)
+            logger.info(f"📦 Inferencia por lotes de {WHISPER_BATCH_SIZE} fragmentos")
+            if not WHISPER_VAD_FILTER:
+                logger.warning("⚠️ WHISPER_VAD_FILTER=false se ignora en la inferencia por lotes: "
+                               "el VAD es el que corta el audio en fragmentos")
+    
+    def _use_fp16(self) -> bool:
+        """Decide si openai-whisper decodifica en fp16 (solo en GPU)"""
+        if self.model.device.type != 'cuda' or WHISPER_PRECISION == 'fp32':
+            return False
+        if WHISPER_PRECISION == 'fp16':
+            return True
+        # 'auto': fp16 solo rinde con Tensor Cores (compute capability >= 7.0)
+        use_fp16 = torch.cuda.get_device_capability(self.model.device)[0] >= 7
+        logger.info(f"🎚️ Precisión: {'fp16' if use_fp16 else 'fp32'}")
+        return use_fp16
+    
+    def _compile_encoder(self):
+        """Compila el encoder con torch.compile y captura su CUDA graph en el calentamiento"""
+        if not hasattr(torch, 'compile'):
+            logger.warning("⚠️ torch.compile requiere PyTorch >= 2.0, se omite la compilación")
+            return
+        
+        logger.info("🔄 Compilando encoder con torch.compile...")
+        # El encoder siempre recibe 30 s de mel (forma fija), lo que permite
+        # fullgraph y reutilizar el grafo capturado; el decoder modifica su
+        # cache KV mediante hooks en cada token y se deja sin compilar
+        self.model.encoder = torch.compile(self.model.encoder, mode='reduce-overhead', fullgraph=True)
+        
+        with torch.inference_mode():
+            dtype = torch.float16 if self.fp16 else torch.float32
+            mel = torch.zeros(1, self.model.dims.n_mels, 3000, device=self.model.device, dtype=dtype)
+            self.model.encoder(mel)
+        logger.info("✅ Encoder compilado")
+    
+    def _quantize_model(self):
+        """Cuantiza dinámicamente a int8 las capas Linear del modelo (CPU)"""
+        logger.info("🔄 Cuantizando capas Linear a int8...")
+        
+        # whisper.model.Linear es una subclase de nn.Linear y quantize_dynamic
+        # solo reconoce el tipo exacto; en CPU/fp32 su forward es idéntico al de
+        # nn.Linear, así que se reasigna la clase antes de cuantizar
+        for module in self.model.modules():
+            if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+                module.__class__ = torch.nn.Linear
+        
+        self.model = torch.quantization.quantize_dynamic(
+            self.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        self.compute_type = 'int8'
+        logger.info("✅ Modelo cuantizado a int8")
+    
+    def _run_ffmpeg(self, input_path: str, audio_filter: Optional[str] = None) -> subprocess.CompletedProcess:
+        """Ejecuta ffmpeg y devuelve PCM float32 mono 16 kHz por stdout (único punto de invocación)"""
+        # -nostdin/-hide_banner/-loglevel y -vn/-sn/-dn reducen el costo fijo de
+        # arranque: sin lectura de terminal, sin banner y sin sondear streams que
+        # no son de audio (carátulas, subtítulos, datos)
+        cmd = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-i', input_path, '-vn', '-sn', '-dn']
+        if audio_filter:
+            cmd += ['-af', audio_filter]
+        cmd += ['-acodec', 'pcm_f32le', '-ac', '1', '-ar', '16000', '-f', 'f32le', 'pipe:1']
+        return subprocess.run(cmd, capture_output=True, timeout=60)
+    
+    def decode_audio(self, input_path: str) -> Optional[np.ndarray]:
+        """Decodifica el audio a muestras float32 mono 16 kHz listas para Whisper"""
+        try:
+            logger.debug("🔄 Convirtiendo audio...")
+            result = self._run_ffmpeg(
+                input_path,
+                'aresample=resampler=soxr:precision=28,highpass=f=80,lowpass=f=8000'
+            )
             
             if result.returncode == 0:
-                logger.info("✅ Audio convertido exitosamente")
-                return True
+                logger.debug("✅ Audio convertido exitosamente")
+                # Sobre bytes el array sería de solo lectura y torch.from_numpy lo
+                # rechaza con un aviso; bytearray da un búfer escribible
+                return np.frombuffer(bytearray(result.stdout), dtype=np.float32)
             else:
-                logger.warning(f"⚠️ Error en conversión: {result.stderr[:100]}")
-                return self._fallback_conversion(input_path, output_path)
+                logger.warning("⚠️ Error en conversión: %s", result.stderr[:100].decode(errors='replace'))
+                return self._fallback_decode(input_path)
                 
         except Exception as e:
             logger.error(f"❌ Error convirtiendo audio: {e}")
-            return False
+            return None
     
-    def _fallback_conversion(self, input_path: str, output_path: str) -> bool:
-        """Conversión básica de fallback"""
+    def _fallback_decode(self, input_path: str) -> Optional[np.ndarray]:
+        """Decodificación básica de fallback (sin filtros)"""
         try:
-            cmd = [
-                'ffmpeg', '-i', input_path,
-                '-acodec', 'pcm_s16le', '-ac', '1', '-ar', '16000',
-                '-y', output_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            return result.returncode == 0
+            result = self._run_ffmpeg(input_path)
+            if result.returncode != 0:
+                return None
+            return np.frombuffer(bytearray(result.stdout), dtype=np.float32)
             
         except Exception as e:
             logger.error(f"❌ Error en conversión de fallback: {e}")
-            return False
+            return None
     
-    def transcribe_audio(self, audio_path: str, language: str = 'es') -> Dict[str, Any]:
-        """Transcribe un archivo de audio"""
-        logger.info(f"🎯 Transcribiendo: {os.path.basename(audio_path)}")
+    def transcribe_audio(self, audio_path: str, language: str = 'es',
+                         audio_data: Optional[np.ndarray] = None, prefetched: bool = False) -> Dict[str, Any]:
+        """
+        Transcribe un archivo de audio
         
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            temp_path = temp_file.name
+        audio_data son las muestras ya decodificadas, si las hay. Con prefetched=True,
+        audio_data es el resultado de decode_audio y None indica que ya falló (no se reintenta).
+        """
+        logger.info("🎯 Transcribiendo: %s", os.path.basename(audio_path))
         
         try:
-            # Convertir audio
-            if not self.convert_audio_format(audio_path, temp_path):
+            # Decodificar audio directamente a memoria: sin WAV temporal y sin
+            # que Whisper vuelva a invocar ffmpeg
+            if audio_data is None and not prefetched:
+                audio_data = self.decode_audio(audio_path)
+            if audio_data is None:
                 raise HTTPException(status_code=400, detail="Error convirtiendo audio")
             
-            # Verificar archivo convertido
-            if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            if audio_data.size == 0:
                 raise HTTPException(status_code=400, detail="Archivo convertido está vacío")
             
             # Prompt para mejor formato
@@ -140,50 +391,12 @@ class WhisperService:
             )
             
             # Transcribir con Whisper
-            logger.info("🔄 Transcribiendo con Whisper...")
+            logger.debug("🔄 Transcribiendo con Whisper...")
             
-            try:
-                result = self.model.transcribe(
-                    temp_path,
-                    language=language,
-                    fp16=False,
-                    verbose=False,
-                    temperature=0.0,
-                    best_of=1,
-                    beam_size=1,
-                    patience=1.0,
-                    suppress_tokens=[-1],
-                    without_timestamps=False,
-                    condition_on_previous_text=True,
-                    no_speech_threshold=0.6,
-                    compression_ratio_threshold=2.4,
-                    initial_prompt=initial_prompt
-                )
-            except RuntimeError as rt_error:
-                error_msg = str(rt_error).lower()
-                if any(word in error_msg for word in ["tensor", "reshape", "dimension", "size", "batch"]):
-                    logger.warning(f"⚠️ Error de tensor detectado: {rt_error}")
-                    logger.info("🔄 Intentando con parámetros conservadores...")
-                    
-                    # Intentar con parámetros más conservadores
-                    result = self.model.transcribe(
-                        temp_path,
-                        language=language,
-                        fp16=False,
-                        verbose=False,
-                        temperature=0.0,
-                        best_of=1,
-                        beam_size=1,
-                        patience=1.0,
-                        suppress_tokens=[-1],
-                        without_timestamps=True,
-                        condition_on_previous_text=False,
-                        no_speech_threshold=0.6,
-                        compression_ratio_threshold=2.4,
-                        initial_prompt=""
-                    )
-                else:
-                    raise
+            if WHISPER_BACKEND == 'faster-whisper':
+                result = self._transcribe_faster_whisper(audio_data, language, initial_prompt)
+            else:
+                result = self._transcribe_openai_whisper(audio_data, language, initial_prompt)
             
             # Formatear resultado
             transcript = self._format_transcript(result)
@@ -205,10 +418,76 @@ class WhisperService:
                 "error": str(e),
                 "timestamp": datetime.now().isoformat()
             }
-        finally:
-            # Limpiar archivo temporal
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+    
+    def _transcribe_openai_whisper(self, audio_data: np.ndarray, language: str, initial_prompt: str) -> Dict[str, Any]:
+        """Transcribe con la implementación de referencia de openai-whisper"""
+        # inference_mode evita el registro de autograd durante la inferencia
+        with torch.inference_mode():
+            try:
+                return self.model.transcribe(
+                    audio_data,
+                    language=language,
+                    without_timestamps=False,
+                    condition_on_previous_text=True,
+                    initial_prompt=initial_prompt,
+                    fp16=self.fp16,
+                    **WHISPER_DECODE_OPTIONS
+                )
+            except RuntimeError as rt_error:
+                error_msg = str(rt_error).lower()
+                if any(word in error_msg for word in ["tensor", "reshape", "dimension", "size", "batch"]):
+                    logger.warning("⚠️ Error de tensor detectado: %s", rt_error)
+                    logger.info("🔄 Intentando con parámetros conservadores...")
+                    
+                    # Intentar con parámetros más conservadores
+                    return self.model.transcribe(
+                        audio_data,
+                        language=language,
+                        without_timestamps=True,
+                        condition_on_previous_text=False,
+                        initial_prompt="",
+                        fp16=self.fp16,
+                        **WHISPER_DECODE_OPTIONS
+                    )
+                raise
+    
+    def _transcribe_faster_whisper(self, audio_data: np.ndarray, language: str, initial_prompt: str) -> Dict[str, Any]:
+        """Transcribe con faster-whisper y devuelve el mismo formato que openai-whisper"""
+        if self.batched_pipeline is not None:
+            # El audio se corta en fragmentos por voz que se decodifican juntos en
+            # una sola pasada; los fragmentos son independientes entre sí, por lo
+            # que no se condiciona con el texto previo
+            segments_iter, info = self.batched_pipeline.transcribe(
+                audio_data,
+                language=language,
+                without_timestamps=False,
+                initial_prompt=initial_prompt,
+                batch_size=WHISPER_BATCH_SIZE,
+                # Sin VAD (ni clip_timestamps) el pipeline por lotes falla con audios de
+                # más de 30 s, así que aquí siempre se activa
+                vad_filter=True,
+                **FASTER_WHISPER_DECODE_OPTIONS
+            )
+        else:
+            segments_iter, info = self.model.transcribe(
+                audio_data,
+                language=language,
+                without_timestamps=False,
+                condition_on_previous_text=True,
+                initial_prompt=initial_prompt,
+                vad_filter=WHISPER_VAD_FILTER,
+                **FASTER_WHISPER_DECODE_OPTIONS
+            )
+        # Los segmentos se generan de forma perezosa: la decodificación ocurre al iterar
+        segments = [
+            {"start": segment.start, "end": segment.end, "text": segment.text}
+            for segment in segments_iter
+        ]
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": info.language
+        }
     
     def _format_transcript(self, result) -> str:
         """Formatea la transcripción para mejor legibilidad"""
@@ -230,10 +509,8 @@ class WhisperService:
     
     def _apply_basic_formatting(self, text: str) -> str:
         """Aplica formato básico al texto"""
-        import re
-        
         # Limpiar espacios múltiples
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = _WHITESPACE_RE.sub(' ', text).strip()
         
         if not text:
             return text
@@ -242,12 +519,12 @@ class WhisperService:
         text = text[0].upper() + text[1:] if len(text) > 1 else text.upper()
         
         # Detectar preguntas
-        question_words = r'\b(qué|quién|quiénes|cuál|cuáles|cómo|cuándo|dónde|por qué|para qué|cuánto|cuánta|cuántos|cuántas)\b'
-        text = re.sub(r'(' + question_words + r'[^.!?]*)', r'\1?', text, flags=re.IGNORECASE)
+        lowered = text.lower()
+        if any(trigger in lowered for trigger in _QUESTION_TRIGGERS):
+            text = _QUESTION_RE.sub(r'\1?', text)
         
         # Corregir espacios alrededor de puntuación
-        text = re.sub(r'\s+([.,!?;:])', r'\1', text)
-        text = re.sub(r'([.,!?;:])\s*', r'\1 ', text)
+        text = _PUNCT_SPACING_RE.sub(r'\1 ', text)
         
         # Asegurar que termina con punto
         if text and not text.rstrip().endswith(('.', '!', '?')):
@@ -263,49 +540,41 @@ class WhisperService:
         formatted_lines.append("=" * 60)
         formatted_lines.append("")
         
+        segments = result["segments"]
+        last_index = len(segments) - 1
         current_speaker_text = []
         current_start_time = None
-        accumulated_duration = 0
         
-        for i, segment in enumerate(result["segments"]):
-            start_time = segment["start"]
-            end_time = segment["end"]
+        for i, segment in enumerate(segments):
             text = segment["text"].strip()
             
             if not text:
                 continue
             
+            end_time = segment["end"]
             if current_start_time is None:
-                current_start_time = start_time
+                current_start_time = segment["start"]
             
             current_speaker_text.append(text)
-            accumulated_duration = end_time - current_start_time
-            
-            # Agrupar segmentos cada 30 segundos
-            next_segment_gap = 0
-            if i + 1 < len(result["segments"]):
-                next_segment_gap = result["segments"][i + 1]["start"] - end_time
             
+            # Agrupar segmentos cada 30 segundos o al haber una pausa de más de 2 segundos
+            # (el último segmento se evalúa primero para no indexar fuera de rango)
             should_break = (
-                accumulated_duration > 30 or
-                next_segment_gap > 2 or
-                i == len(result["segments"]) - 1
+                i == last_index or
+                end_time - current_start_time > 30 or
+                segments[i + 1]["start"] - end_time > 2
             )
             
-            if should_break and current_speaker_text:
-                combined_text = ' '.join(current_speaker_text)
-                combined_text = self._apply_basic_formatting(combined_text)
+            if should_break:
+                combined_text = self._apply_basic_formatting(' '.join(current_speaker_text))
                 
                 start_formatted = self._format_time(current_start_time)
                 end_formatted = self._format_time(end_time)
                 
-                formatted_lines.append(f"[{start_formatted} - {end_formatted}]")
-                formatted_lines.append(combined_text)
-                formatted_lines.append("")
+                formatted_lines.extend((f"[{start_formatted} - {end_formatted}]", combined_text, ""))
                 
                 current_speaker_text = []
                 current_start_time = None
-                accumulated_duration = 0
         
         # Estadísticas
         formatted_lines.append("=" * 60)
@@ -337,13 +606,14 @@ class WhisperService:
     
     def _format_time(self, seconds: float) -> str:
         """Convierte segundos a formato MM:SS"""
-        minutes = int(seconds // 60)
-        seconds = int(seconds % 60)
-        return f"{minutes:02d}:{seconds:02d}"
+        return _format_whole_seconds(int(seconds))
 
 # Inicializar servicio
 whisper_service = WhisperService()
 
+# Hilos para decodificar por adelantado los audios de /transcribe-batch
+decode_executor = ThreadPoolExecutor(max_workers=max(1, WHISPER_DECODE_PREFETCH), thread_name_prefix="ffmpeg")
+
 @app.get("/")
 async def root():
     """Endpoint raíz"""
@@ -361,6 +631,9 @@ async def health_check():
         "status": "healthy",
         "model_loaded": whisper_service.model is not None,
         "model_name": whisper_service.model_name,
+        "backend": WHISPER_BACKEND,
+        "device": whisper_service.device,
+        "compute_type": whisper_service.compute_type,
         "timestamp": datetime.now().isoformat()
     }
 
@@ -391,13 +664,85 @@ async def transcribe_file(
                 
         finally:
             # Limpiar archivo temporal
-            if os.path.exists(temp_path):
+            try:
                 os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
                 
     except Exception as e:
         logger.error(f"Error procesando archivo: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/transcribe-batch")
+async def transcribe_batch(
+    files: List[UploadFile] = File(...),
+    language: str = "es"
+):
+    """Transcribe varios archivos de audio en una sola petición"""
+    results = []
+    temp_paths = []
+    pending = deque()
+    
+    try:
+        # Crear archivos temporales con el contenido subido; la ruta se registra
+        # antes de escribir para que el finally la elimine aunque falle la escritura
+        for upload in files:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(upload.filename)[1]) as temp_file:
+                temp_paths.append(temp_file.name)
+                temp_file.write(await upload.read())
+        
+        # ffmpeg decodifica los siguientes audios en otros hilos mientras el modelo
+        # transcribe el actual; la ventana acota la memoria de PCM retenida
+        next_index = 0
+        
+        for upload, temp_path in zip(files, temp_paths):
+            while next_index < len(temp_paths) and len(pending) <= WHISPER_DECODE_PREFETCH:
+                pending.append(decode_executor.submit(whisper_service.decode_audio, temp_paths[next_index]))
+                next_index += 1
+            decoded = pending.popleft()
+            
+            try:
+                result = whisper_service.transcribe_audio(temp_path, language, audio_data=decoded.result(), prefetched=True)
+            except Exception as e:
+                logger.error(f"Error procesando archivo {upload.filename}: {e}")
+                result = {
+                    "success": False,
+                    "error": str(e),
+                    "timestamp": datetime.now().isoformat()
+                }
+            finally:
+                # Limpiar archivo temporal
+                try:
+                    os.unlink(temp_path)
+                except FileNotFoundError:
+                    pass
+            
+            result["filename"] = upload.filename
+            results.append(result)
+        
+    except Exception as e:
+        logger.error(f"Error procesando lote: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        # Descartar las decodificaciones que no empezaron y esperar a las que
+        # están en curso antes de borrar los archivos que leen
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        for temp_path in temp_paths:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+    
+    return JSONResponse(content={
+        "success": True,
+        "results": results,
+        "total": len(results),
+        "successful": sum(1 for r in results if r["success"])
+    })
+
 @app.post("/transcribe-url")
 async def transcribe_url(
     audio_url: str,
@@ -405,8 +750,6 @@ async def transcribe_url(
 ):
     """Transcribe un archivo de audio desde URL"""
     try:
-        import requests
-        
         # Descargar archivo
         response = requests.get(audio_url, stream=True, timeout=30)
         response.raise_for_status()
@@ -431,8 +774,10 @@ async def transcribe_url(
                 
         finally:
             # Limpiar archivo temporal
-            if os.path.exists(temp_path):
+            try:
                 os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
                 
     except Exception as e:
         logger.error(f"Error procesando URL: {e}")
@@ -1,32 +1,125 @@
 import os
+import queue
+import shutil
+import threading
+import time
+import orjson
 import requests
-import tempfile
-from typing import Optional, Dict, Any, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from contextlib import ExitStack
+from itertools import islice
+from typing import Optional, Dict, Any, List, Set, Tuple, Iterable, Iterator
 from datetime import datetime
 from config import Config
 from custom_logger import CustomLogger
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
 # Logger personalizado
 logger = CustomLogger()
 
+# Segundos durante los que se reutiliza la respuesta de /health
+SERVICE_INFO_TTL = 30
+
+# Segundos para establecer la conexión; la lectura conserva su propio límite
+CONNECT_TIMEOUT = 3
+
+# Máximo de archivos que el hilo de limpieza borra por iteración
+DELETE_BATCH_SIZE = 128
+
+# La barra se redibuja como mucho cada 0.5s, no en cada update()
+PROGRESS_BAR_OPTIONS = dict(desc="Procesando llamadas", unit="llamada", mininterval=0.5)
+
 
 class AudioProcessorClient:
     def __init__(self):
         self.config = Config()
         self.whisper_service_url = os.getenv('WHISPER_SERVICE_URL', 'http://localhost:8000')
-        self._test_connection()
+        self._service_info = None
+        self._service_info_at = 0.0
+        self._date_dirs: Dict[str, Tuple[str, str]] = {}
+        self._ensured_dirs: Set[str] = set()
+        self._ensured_dirs_lock = threading.Lock()
+        self.session = self._create_session()
+        
+        # Los audios ya transcritos se borran en segundo plano, fuera del camino crítico
+        self._delete_q: "queue.Queue[str]" = queue.Queue()
+        threading.Thread(target=self._drain_deletes, name="audio-cleanup", daemon=True).start()
+        
+        # Permite omitir el health check inicial cuando se crean muchos clientes
+        if os.getenv('SKIP_WHISPER_HEALTHCHECK', 'false').lower() in ('1', 'true'):
+            logger.info("⏭️ Health check del servicio de Whisper omitido")
+        else:
+            self._test_connection()
+    
+    def _create_session(self) -> requests.Session:
+        """Crea una sesión HTTP con pool de conexiones keep-alive para todos los workers"""
+        pool_size = max(1, self.config.MAX_CPU_WORKERS)
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size * 2,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.2,
+                status_forcelist=(502, 503, 504),
+                # Solo GET se reintenta por estado: los POST llevan un MultipartEncoder
+                # que no se puede rebobinar y una transcripción no es idempotente
+                # (un 504 suele indicar que la primera sigue en curso). Los POST
+                # solo se reintentan ante errores de conexión, sin cuerpo enviado
+                allowed_methods=frozenset({'GET'}),
+                raise_on_status=False  # Tras agotar reintentos se devuelve la respuesta para registrarla
+            )
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def _cache_service_info(self, service_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Guarda la respuesta de /health para reutilizarla durante SERVICE_INFO_TTL segundos"""
+        self._service_info = service_info
+        self._service_info_at = time.monotonic()
+        return service_info
+    
+    def _ensure_dir(self, directory: str):
+        """Crea el directorio una sola vez por proceso (evita stat/mkdir por archivo)"""
+        if directory in self._ensured_dirs:
+            return
+        with self._ensured_dirs_lock:
+            if directory not in self._ensured_dirs:
+                os.makedirs(directory, exist_ok=True)
+                self._ensured_dirs.add(directory)
+    
+    def _drain_deletes(self):
+        """Hilo de limpieza: borra en lotes los audios encolados por _complete_call"""
+        while True:
+            paths = [self._delete_q.get()]
+            while len(paths) < DELETE_BATCH_SIZE:
+                try:
+                    paths.append(self._delete_q.get_nowait())
+                except queue.Empty:
+                    break
+            for path in paths:
+                try:
+                    os.unlink(path)
+                    logger.debug(f"Archivo de audio eliminado: {path}")
+                except OSError:
+                    pass
+                finally:
+                    self._delete_q.task_done()
     
     def _test_connection(self):
         """Verifica que el servicio de Whisper esté disponible"""
         try:
-            response = requests.get(f"{self.whisper_service_url}/health", timeout=10)
+            response = self.session.get(f"{self.whisper_service_url}/health", timeout=(CONNECT_TIMEOUT, 10))
             if response.status_code == 200:
-                health_data = response.json()
+                health_data = orjson.loads(response.content)
+                self._cache_service_info(health_data)
                 logger.success("✅ Conectado al servicio de Whisper", 
-                             details=f"Modelo: {health_data.get('model_name', 'unknown')}")
+                             details=f"Modelo: {health_data.get('model_name', 'unknown')}, "
+                                     f"cómputo: {health_data.get('compute_type', 'unknown')}")
             else:
                 raise Exception(f"Servicio no saludable: {response.status_code}")
         except Exception as e:
@@ -44,39 +137,33 @@ class AudioProcessorClient:
         Returns:
             Transcripción formateada o None si falla
         """
-        logger.info("=" * 60)
-        logger.info(f"🎯 INICIANDO TRANSCRIPCIÓN: {os.path.basename(audio_path)}")
-        logger.info("=" * 60)
+        logger.info(f"🎯 Iniciando transcripción: {os.path.basename(audio_path)}")
         
         try:
-            # Verificar que el archivo existe
-            if not os.path.exists(audio_path):
-                logger.error("Archivo de audio no encontrado", file_info=audio_path)
-                return None
-            
-            # Enviar archivo al servicio de Whisper
+            # Enviar archivo al servicio de Whisper en streaming: el cuerpo
+            # multipart se lee del disco por bloques en lugar de armarse en memoria
+            # (si el archivo no existe, open() falla y se registra abajo)
             with open(audio_path, 'rb') as audio_file:
-                files = {'file': (os.path.basename(audio_path), audio_file, 'audio/mpeg')}
-                data = {'language': 'es'}
+                encoder = MultipartEncoder(fields={
+                    'file': (os.path.basename(audio_path), audio_file, 'audio/mpeg'),
+                    'language': 'es'
+                })
                 
                 logger.progress("Transcribiendo con servicio de Whisper", file_info=audio_path)
                 
-                response = requests.post(
+                response = self.session.post(
                     f"{self.whisper_service_url}/transcribe",
-                    files=files,
-                    data=data,
-                    timeout=300  # 5 minutos timeout
+                    data=encoder,
+                    headers={'Content-Type': encoder.content_type},
+                    timeout=(CONNECT_TIMEOUT, 300)  # 5 minutos de lectura
                 )
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    result = orjson.loads(response.content)
                     if result.get('success'):
                         transcript = result.get('transcript', '')
                         logger.success("Transcripción exitosa", file_info=audio_path, 
                                       details=f"Caracteres: {len(transcript)}")
-                        logger.info("=" * 60)
-                        logger.info(f"✅ FINALIZADA: {os.path.basename(audio_path)}")
-                        logger.info("=" * 60 + "\n")
                         return transcript
                     else:
                         logger.error("Error en transcripción", file_info=audio_path, 
@@ -91,6 +178,53 @@ class AudioProcessorClient:
             logger.error("Error en transcripción", file_info=audio_path, details=f"Error: {e}")
             return None
 
+    def transcribe_audio_batch(self, audio_paths: List[str]) -> List[Optional[str]]:
+        """
+        Transcribe varios archivos de audio con una sola petición al servicio
+        
+        Args:
+            audio_paths: Rutas de los archivos de audio
+        
+        Returns:
+            Lista de transcripciones (None para las que fallaron), en el mismo orden
+        """
+        transcripts = [None] * len(audio_paths)
+        logger.progress(f"Transcribiendo lote de {len(audio_paths)} audios con servicio de Whisper")
+        
+        try:
+            with ExitStack() as stack:
+                fields = [('language', 'es')]
+                for audio_path in audio_paths:
+                    audio_file = stack.enter_context(open(audio_path, 'rb'))
+                    fields.append(('files', (os.path.basename(audio_path), audio_file, 'audio/mpeg')))
+                encoder = MultipartEncoder(fields=fields)
+                
+                response = self.session.post(
+                    f"{self.whisper_service_url}/transcribe-batch",
+                    data=encoder,
+                    headers={'Content-Type': encoder.content_type},
+                    timeout=(CONNECT_TIMEOUT, 300 * len(audio_paths))  # 5 minutos de lectura por audio
+                )
+            
+            if response.status_code != 200:
+                logger.error("Error del servicio en lote", 
+                           details=f"Status: {response.status_code}, Response: {response.text}")
+                return transcripts
+            
+            for i, item in enumerate(orjson.loads(response.content).get('results', [])[:len(audio_paths)]):
+                if item.get('success'):
+                    transcripts[i] = item.get('transcript', '')
+                    logger.success("Transcripción exitosa", file_info=audio_paths[i], 
+                                  details=f"Caracteres: {len(transcripts[i])}")
+                else:
+                    logger.error("Error en transcripción", file_info=audio_paths[i], 
+                               details=item.get('error', 'Error desconocido'))
+                    
+        except Exception as e:
+            logger.error("Error en transcripción por lote", details=f"Error: {e}")
+        
+        return transcripts
+
     def transcribe_audio_from_url(self, audio_url: str) -> Optional[str]:
         """
         Transcribe un archivo de audio desde URL usando el servicio de Whisper
@@ -101,9 +235,7 @@ class AudioProcessorClient:
         Returns:
             Transcripción formateada o None si falla
         """
-        logger.info("=" * 60)
-        logger.info(f"🎯 TRANSCRIBIENDO DESDE URL: {audio_url}")
-        logger.info("=" * 60)
+        logger.info(f"🎯 Transcribiendo desde URL: {audio_url}")
         
         try:
             data = {
@@ -113,21 +245,19 @@ class AudioProcessorClient:
             
             logger.progress("Transcribiendo URL con servicio de Whisper", file_info=audio_url)
             
-            response = requests.post(
+            # El endpoint recibe audio_url y language como parámetros de query
+            response = self.session.post(
                 f"{self.whisper_service_url}/transcribe-url",
-                json=data,
-                timeout=300  # 5 minutos timeout
+                params=data,
+                timeout=(CONNECT_TIMEOUT, 300)  # 5 minutos de lectura
             )
             
             if response.status_code == 200:
-                result = response.json()
+                result = orjson.loads(response.content)
                 if result.get('success'):
                     transcript = result.get('transcript', '')
                     logger.success("Transcripción exitosa", file_info=audio_url, 
                                   details=f"Caracteres: {len(transcript)}")
-                    logger.info("=" * 60)
-                    logger.info(f"✅ FINALIZADA: {audio_url}")
-                    logger.info("=" * 60 + "\n")
                     return transcript
                 else:
                     logger.error("Error en transcripción", file_info=audio_url, 
@@ -153,12 +283,23 @@ class AudioProcessorClient:
         Returns:
             True si se guardó exitosamente, False en caso contrario
         """
+        # Escribir a un archivo temporal hermano y reemplazar atómicamente
+        # para no dejar transcripciones parciales si el proceso se interrumpe
+        tmp_path = f"{output_path}.tmp"
         try:
             # Crear directorio si no existe
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            self._ensure_dir(os.path.dirname(output_path))
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(transcript)
+            # El contenido ya está completo: se codifica una vez y se escribe
+            # directo al descriptor, sin capa de texto ni buffer intermedio
+            data = memoryview(transcript.encode('utf-8'))
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, output_path)
             
             logger.success("Transcripción guardada", file_info=output_path, 
                           details=f"Caracteres: {len(transcript)}")
@@ -166,6 +307,11 @@ class AudioProcessorClient:
         except Exception as e:
             logger.error("Error guardando transcripción", file_info=output_path, 
                         details=f"Error: {e}")
+            # No dejar el temporal a medio escribir en el árbol de transcripciones
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
             return False
 
     def download_audio_file(self, audio_url: str, local_path: str) -> bool:
@@ -181,17 +327,18 @@ class AudioProcessorClient:
         """
         try:
             # Crear directorio si no existe
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            self._ensure_dir(os.path.dirname(local_path))
             
             # Descargar archivo
             logger.progress("Descargando audio", file_info=audio_url)
-            response = requests.get(audio_url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            # Guardar archivo
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            with self.session.get(audio_url, stream=True, timeout=(CONNECT_TIMEOUT, 30)) as response:
+                response.raise_for_status()
+                
+                # Guardar archivo copiando el stream crudo en bloques de 1 MiB
+                # (decode_content respeta gzip/deflate si el servidor lo usa)
+                response.raw.decode_content = True
+                with open(local_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1024 * 1024)
             
             logger.success("Audio descargado", file_info=local_path)
             return True
@@ -200,86 +347,173 @@ class AudioProcessorClient:
             logger.error(f"Error descargando audio: {e}", file_info=audio_url)
             return False
 
-    def process_single_call(self, call_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _resolve_call_paths(self, call_data: Dict[str, Any]) -> Dict[str, str]:
         """
-        Procesa una sola llamada: descarga y transcribe
+        Calcula una sola vez las rutas locales de una llamada y las guarda en
+        call_data['_paths'] para que reintentos o limpiezas no repitan el trabajo
         
         Args:
             call_data: Diccionario con información de la llamada
         
         Returns:
-            Diccionario con resultado del procesamiento
+            Diccionario con audio_dir, text_dir, audio_path y text_path
         """
-        call_id = call_data.get('id', 'unknown')
-        audio_path = call_data.get('audio_path', '')
+        paths = call_data.get('_paths')
+        if paths is not None:
+            return paths
+        
+        audio_filename = os.path.basename(call_data.get('audio_path', ''))
+        
+        # Manejar fecha de llamada
+        fecha_llamada = call_data.get('fecha_llamada')
+        if (isinstance(fecha_llamada, str) and len(fecha_llamada) >= 10 and
+                fecha_llamada[4] == '-' and fecha_llamada[7] == '-'):
+            # Camino rápido para 'YYYY-MM-DD[...]': basta con cortar la cadena
+            fecha_str = fecha_llamada[:10].replace('-', '/')
+        else:
+            if isinstance(fecha_llamada, str):
+                fecha_llamada = datetime.fromisoformat(fecha_llamada.replace('Z', '+00:00'))
+            elif not fecha_llamada:
+                fecha_llamada = datetime.now()
+            fecha_str = f"{fecha_llamada.year:04d}/{fecha_llamada.month:02d}/{fecha_llamada.day:02d}"
         
-        result = {
-            'call_id': call_id,
+        # Los directorios se calculan una vez por día de llamadas
+        date_dirs = self._date_dirs.get(fecha_str)
+        if date_dirs is None:
+            date_dirs = (
+                os.path.join(self.config.AUDIO_DOWNLOAD_PATH, fecha_str),
+                os.path.join(self.config.TEXT_OUTPUT_PATH, fecha_str)
+            )
+            self._date_dirs[fecha_str] = date_dirs
+        audio_dir, text_dir = date_dirs
+        
+        paths = {
+            'audio_dir': audio_dir,
+            'text_dir': text_dir,
+            'audio_path': os.path.join(audio_dir, audio_filename),
+            'text_path': os.path.join(text_dir, f"{os.path.splitext(audio_filename)[0]}.txt")
+        }
+        call_data['_paths'] = paths
+        return paths
+
+    def _new_result(self, call_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Crea el diccionario de resultado inicial de una llamada"""
+        return {
+            'call_id': call_data.get('id', 'unknown'),
             'success': False,
             'transcript_path': None,
             'error': None
         }
+
+    def _ensure_local_audio(self, call_data: Dict[str, Any], result: Dict[str, Any]) -> bool:
+        """
+        Descarga el audio de la llamada si no existe localmente
+        
+        Returns:
+            True si el audio está disponible, False si falló la descarga
+        """
+        local_audio_path = self._resolve_call_paths(call_data)['audio_path']
+        if not os.path.exists(local_audio_path):
+            audio_url = f"{self.config.AUDIO_BASE_URL}/{call_data.get('audio_path', '')}"
+            if not self.download_audio_file(audio_url, local_audio_path):
+                result['error'] = "Error descargando audio"
+                return False
+        return True
+
+    def _complete_call(self, call_data: Dict[str, Any], transcript: Optional[str], result: Dict[str, Any],
+                       cleanup_audio: bool = True):
+        """Guarda la transcripción de la llamada y limpia el audio si está configurado"""
+        paths = self._resolve_call_paths(call_data)
+        
+        if transcript:
+            # Guardar transcripción
+            if self.save_transcript(transcript, paths['text_path']):
+                result['success'] = True
+                result['transcript_path'] = paths['text_path']
+            else:
+                result['error'] = "Error guardando transcripción"
+        else:
+            result['error'] = "Error en transcripción"
+        
+        # Limpiar archivos si está configurado
+        if cleanup_audio and self.config.AUTO_CLEANUP and self.config.CLEANUP_AUDIO_FILES:
+            self._delete_q.put(paths['audio_path'])
+
+    def process_single_call(self, call_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Procesa una sola llamada: descarga y transcribe
+        
+        Args:
+            call_data: Diccionario con información de la llamada
+        
+        Returns:
+            Diccionario con resultado del procesamiento
+        """
+        result = self._new_result(call_data)
         
         try:
-            # Construir rutas
-            audio_filename = os.path.basename(audio_path)
-            
-            # Manejar fecha de llamada
-            fecha_llamada = call_data.get('fecha_llamada')
-            if isinstance(fecha_llamada, str):
-                fecha_llamada = datetime.strptime(fecha_llamada, '%Y-%m-%d')
-            elif not fecha_llamada:
-                fecha_llamada = datetime.now()
-            
-            fecha_str = fecha_llamada.strftime('%Y/%m/%d')
-            
-            # Rutas locales
-            local_audio_path = os.path.join(
-                self.config.AUDIO_DOWNLOAD_PATH,
-                fecha_str,
-                audio_filename
-            )
-            
-            transcript_path = os.path.join(
-                self.config.TEXT_OUTPUT_PATH,
-                fecha_str,
-                f"{os.path.splitext(audio_filename)[0]}.txt"
-            )
+            # El servicio descarga el audio por sí mismo: sin escritura a disco ni re-subida
+            if self.config.PREFER_URL_TRANSCRIPTION and not os.path.exists(self._resolve_call_paths(call_data)['audio_path']):
+                audio_url = f"{self.config.AUDIO_BASE_URL}/{call_data.get('audio_path', '')}"
+                transcript = self.transcribe_audio_from_url(audio_url)
+                self._complete_call(call_data, transcript, result, cleanup_audio=False)
+                return result
             
             # Descargar audio si no existe
-            if not os.path.exists(local_audio_path):
-                audio_url = f"{self.config.AUDIO_BASE_URL}/{audio_path}"
-                if not self.download_audio_file(audio_url, local_audio_path):
-                    result['error'] = "Error descargando audio"
-                    return result
+            if not self._ensure_local_audio(call_data, result):
+                return result
             
             # Transcribir audio usando el servicio
-            transcript = self.transcribe_audio(local_audio_path)
-            if transcript:
-                # Guardar transcripción
-                if self.save_transcript(transcript, transcript_path):
-                    result['success'] = True
-                    result['transcript_path'] = transcript_path
-                else:
-                    result['error'] = "Error guardando transcripción"
-            else:
-                result['error'] = "Error en transcripción"
-            
-            # Limpiar archivos si está configurado
-            if self.config.AUTO_CLEANUP and self.config.CLEANUP_AUDIO_FILES:
-                try:
-                    os.remove(local_audio_path)
-                    logger.debug(f"Archivo de audio eliminado: {local_audio_path}")
-                except:
-                    pass
-            
+            transcript = self.transcribe_audio(self._resolve_call_paths(call_data)['audio_path'])
+            self._complete_call(call_data, transcript, result)
             return result
             
         except Exception as e:
             result['error'] = str(e)
-            logger.error(f"Error procesando llamada {call_id}: {e}")
+            logger.error(f"Error procesando llamada {result['call_id']}: {e}")
             return result
 
+    def process_call_group(self, calls_group: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Procesa un grupo de llamadas enviando todos sus audios en una sola
+        petición al servicio de Whisper
+        
+        Args:
+            calls_group: Lista de diccionarios con información de llamadas
+        
+        Returns:
+            Lista de resultados en el mismo orden que calls_group
+        """
+        results = []
+        ready = []
+        
+        # Descargar los audios del grupo
+        for call_data in calls_group:
+            result = self._new_result(call_data)
+            results.append(result)
+            try:
+                if self._ensure_local_audio(call_data, result):
+                    ready.append((call_data, result))
+            except Exception as e:
+                result['error'] = str(e)
+                logger.error(f"Error procesando llamada {result['call_id']}: {e}")
+        
+        if not ready:
+            return results
+        
+        # Transcribir todos los audios disponibles con una sola petición
+        audio_paths = [self._resolve_call_paths(call_data)['audio_path'] for call_data, _ in ready]
+        transcripts = self.transcribe_audio_batch(audio_paths)
+        
+        for (call_data, result), transcript in zip(ready, transcripts):
+            try:
+                self._complete_call(call_data, transcript, result)
+            except Exception as e:
+                result['error'] = str(e)
+                logger.error(f"Error procesando llamada {result['call_id']}: {e}")
+        
+        return results
+
     def process_calls_batch(self, calls_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Procesa un lote de llamadas, con opción de procesamiento paralelo
@@ -300,10 +534,37 @@ class AudioProcessorClient:
             self.config.MAX_CPU_WORKERS > 1
         )
         
-        if use_parallel:
-            return self._process_calls_parallel(calls_data)
+        if self.config.TRANSCRIPTION_BATCH_SIZE > 1 and total_calls > 1:
+            results = self._process_calls_grouped(calls_data, use_parallel)
+        elif use_parallel:
+            results = self._process_calls_parallel(calls_data)
         else:
-            return self._process_calls_sequential(calls_data)
+            results = self._process_calls_sequential(calls_data)
+        
+        # Esperar a que el hilo de limpieza termine de borrar los audios del lote
+        self._delete_q.join()
+        return results
+
+    def process_calls_stream(self, calls_iter: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Procesa llamadas a medida que llegan, en bloques de MYSQL_FETCH_SIZE
+        
+        Cada bloque se procesa con process_calls_batch mientras el resto de filas
+        sigue pendiente en el servidor; solo un bloque vive en memoria a la vez.
+        
+        Args:
+            calls_iter: Iterable de diccionarios con información de llamadas
+        
+        Yields:
+            Resultados del procesamiento, en el orden de entrada
+        """
+        chunk_size = max(1, self.config.MYSQL_FETCH_SIZE)
+        calls_iter = iter(calls_iter)
+        while True:
+            chunk = list(islice(calls_iter, chunk_size))
+            if not chunk:
+                break
+            yield from self.process_calls_batch(chunk)
 
     def _process_calls_sequential(self, calls_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -311,9 +572,9 @@ class AudioProcessorClient:
         """
         results = []
         
-        with tqdm(total=len(calls_data), desc="Procesando llamadas", unit="llamada") as pbar:
+        with tqdm(total=len(calls_data), **PROGRESS_BAR_OPTIONS) as pbar:
             for i, call_data in enumerate(calls_data):
-                logger.info(f"📞 Procesando llamada {i+1}/{len(calls_data)}")
+                logger.debug(f"📞 Procesando llamada {i+1}/{len(calls_data)}")
                 result = self.process_single_call(call_data)
                 results.append(result)
                 
@@ -338,39 +599,59 @@ class AudioProcessorClient:
         
         results = []
         
-        # Usar ThreadPoolExecutor
+        # executor.map conserva el orden de entrada sin diccionario de futures;
+        # process_single_call nunca lanza excepciones (devuelve 'error')
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Crear futures para cada llamada
-            future_to_call = {
-                executor.submit(self.process_single_call, call_data): call_data
-                for call_data in calls_data
-            }
-            
-            # Procesar resultados conforme se completan
-            with tqdm(total=len(calls_data), desc="Procesando llamadas", unit="llamada") as pbar:
-                for future in as_completed(future_to_call):
-                    call_data = future_to_call[future]
-                    try:
-                        result = future.result()
-                        results.append(result)
+            with tqdm(total=len(calls_data), **PROGRESS_BAR_OPTIONS) as pbar:
+                for result in executor.map(self.process_single_call, calls_data):
+                    results.append(result)
+                    
+                    # Log del resultado
+                    if result['success']:
+                        logger.success(f"✅ Llamada {result['call_id']} procesada")
+                    else:
+                        logger.error(f"❌ Error en llamada {result['call_id']}: {result['error']}")
+                    
+                    pbar.update(1)
+        
+        return results
+
+    def _process_calls_grouped(self, calls_data: List[Dict[str, Any]], use_parallel: bool) -> List[Dict[str, Any]]:
+        """
+        Procesa llamadas en grupos de TRANSCRIPTION_BATCH_SIZE, una petición por grupo
+        """
+        batch_size = self.config.TRANSCRIPTION_BATCH_SIZE
+        
+        # Agrupar llamadas de duración similar, de la más larga a la más corta:
+        # las peticiones quedan equilibradas y las largas arrancan primero, así
+        # ningún worker termina con un lote largo cuando los demás ya acabaron
+        order = sorted(range(len(calls_data)), key=lambda i: calls_data[i].get('duracion') or 0, reverse=True)
+        groups = [
+            [calls_data[i] for i in order[start:start + batch_size]]
+            for start in range(0, len(order), batch_size)
+        ]
+        max_workers = min(self.config.MAX_CPU_WORKERS, len(groups)) if use_parallel else 1
+        logger.info(f"📦 Procesamiento por lotes: {len(groups)} peticiones de hasta {batch_size} llamadas "
+                    f"con {max_workers} workers")
+        
+        # Los resultados se devuelven en el orden original de calls_data
+        results: List[Optional[Dict[str, Any]]] = [None] * len(calls_data)
+        position = 0
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            with tqdm(total=len(calls_data), **PROGRESS_BAR_OPTIONS) as pbar:
+                for group_results in executor.map(self.process_call_group, groups):
+                    for result in group_results:
+                        results[order[position]] = result
+                        position += 1
                         
                         # Log del resultado
                         if result['success']:
                             logger.success(f"✅ Llamada {result['call_id']} procesada")
                         else:
                             logger.error(f"❌ Error en llamada {result['call_id']}: {result['error']}")
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Excepción procesando llamada: {e}")
-                        results.append({
-                            'call_id': call_data.get('id', 'unknown'),
-                            'success': False,
-                            'transcript_path': None,
-                            'error': str(e)
-                        })
                     
-                    finally:
-                        pbar.update(1)
+                    pbar.update(len(group_results))
         
         return results
 
@@ -381,10 +662,14 @@ class AudioProcessorClient:
         Returns:
             Diccionario con información del servicio
         """
+        if (self._service_info is not None and
+                time.monotonic() - self._service_info_at < SERVICE_INFO_TTL):
+            return self._service_info
+        
         try:
-            response = requests.get(f"{self.whisper_service_url}/health", timeout=10)
+            response = self.session.get(f"{self.whisper_service_url}/health", timeout=(CONNECT_TIMEOUT, 10))
             if response.status_code == 200:
-                return response.json()
+                return self._cache_service_info(orjson.loads(response.content))
             else:
                 return {
                     "status": "error",
@@ -11,6 +11,10 @@ class Config:
     MYSQL_USER = os.getenv('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', '')
     MYSQL_DATABASE = os.getenv('MYSQL_DATABASE', 'llamadas')
+    MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', 2))  # Conexiones reutilizables del pool
+    MYSQL_COMPRESS = os.getenv('MYSQL_COMPRESS', 'false').lower() == 'true'  # Protocolo comprimido (útil en enlaces lentos/remotos)
+    MYSQL_FETCH_SIZE = int(os.getenv('MYSQL_FETCH_SIZE', 500))  # Filas por lectura del cursor en modo --stream
+    MYSQL_STREAM_TIMEOUT = int(os.getenv('MYSQL_STREAM_TIMEOUT', 3600))  # net_write_timeout mientras se procesa un bloque en modo --stream (debe cubrir un bloque de MYSQL_FETCH_SIZE llamadas)
     
     # Configuración de archivos
     AUDIO_BASE_URL = os.getenv('AUDIO_BASE_URL', '')
@@ -23,6 +27,8 @@ class Config:
     # Configuración de procesamiento
     MAX_CONCURRENT_DOWNLOADS = int(os.getenv('MAX_CONCURRENT_DOWNLOADS', 3))
     MAX_CONCURRENT_TRANSCRIPTIONS = int(os.getenv('MAX_CONCURRENT_TRANSCRIPTIONS', 2))
+    TRANSCRIPTION_BATCH_SIZE = int(os.getenv('TRANSCRIPTION_BATCH_SIZE', 1))  # Audios por petición al servicio (1 = uno por petición)
+    PREFER_URL_TRANSCRIPTION = os.getenv('PREFER_URL_TRANSCRIPTION', 'false').lower() == 'true'  # El servicio descarga el audio (sin copia local)
     
     # Configuración optimizada para CPU
     CPU_OPTIMIZED = os.getenv('CPU_OPTIMIZED', 'true').lower() == 'true'
@@ -1,7 +1,8 @@
-import mysql.connector
+import threading
 from mysql.connector import Error
-from datetime import datetime, date
-from typing import List, Dict, Any
+from mysql.connector.pooling import MySQLConnectionPool
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Iterator
 from config import Config
 import logging
 
@@ -9,22 +10,45 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
+    # Pool compartido por todas las instancias: el handshake TCP + autenticación
+    # se paga una vez por conexión y las reconexiones reutilizan las abiertas
+    _pool = None
+    _pool_lock = threading.Lock()
+    
     def __init__(self):
         self.config = Config()
         self.connection = None
+        # Cursor preparado de la consulta por defecto, ligado a la conexión actual:
+        # reejecutarlo con otras fechas reutiliza la sentencia ya preparada
+        self._calls_cursor = None
+    
+    def _get_pool(self) -> MySQLConnectionPool:
+        """Crea el pool de conexiones la primera vez que se necesita"""
+        if DatabaseManager._pool is None:
+            with DatabaseManager._pool_lock:
+                if DatabaseManager._pool is None:
+                    DatabaseManager._pool = MySQLConnectionPool(
+                        pool_name="calls",
+                        pool_size=max(1, self.config.MYSQL_POOL_SIZE),
+                        pool_reset_session=False,
+                        host=self.config.MYSQL_HOST,
+                        port=self.config.MYSQL_PORT,
+                        user=self.config.MYSQL_USER,
+                        password=self.config.MYSQL_PASSWORD,
+                        database=self.config.MYSQL_DATABASE,
+                        charset='utf8mb4',
+                        collation='utf8mb4_unicode_ci',
+                        autocommit=True,
+                        compress=self.config.MYSQL_COMPRESS
+                    )
+        return DatabaseManager._pool
     
     def connect(self):
-        """Establece conexión con la base de datos MySQL"""
+        """Obtiene una conexión del pool de MySQL"""
         try:
-            self.connection = mysql.connector.connect(
-                host=self.config.MYSQL_HOST,
-                port=self.config.MYSQL_PORT,
-                user=self.config.MYSQL_USER,
-                password=self.config.MYSQL_PASSWORD,
-                database=self.config.MYSQL_DATABASE,
-                charset='utf8mb4',
-                collation='utf8mb4_unicode_ci'
-            )
+            # Devolver al pool la conexión anterior antes de pedir otra
+            self.disconnect()
+            self.connection = self._get_pool().get_connection()
             if self.connection.is_connected():
                 logger.info("Conexión exitosa a MySQL")
                 return True
@@ -33,10 +57,34 @@ class DatabaseManager:
             return False
     
     def disconnect(self):
-        """Cierra la conexión con la base de datos"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("Conexión MySQL cerrada")
+        """Devuelve la conexión al pool"""
+        if self._calls_cursor is not None:
+            try:
+                self._calls_cursor.close()
+            except Error:
+                pass
+            self._calls_cursor = None
+        if self.connection:
+            try:
+                self.connection.close()
+                logger.info("Conexión MySQL devuelta al pool")
+            except Error as e:
+                logger.warning(f"⚠️ Error cerrando conexión: {e}")
+            self.connection = None
+    
+    def _discard_connection(self):
+        """Cierra la conexión sin leer los resultados pendientes"""
+        # La sentencia preparada muere con la sesión
+        self._calls_cursor = None
+        if self.connection:
+            try:
+                # Cerrar la conexión real detrás del PooledMySQLConnection envía COM_QUIT
+                # y corta el socket sin consumir filas; el pool reconecta las conexiones
+                # cerradas al volver a entregarlas
+                self.connection._cnx.close()
+            except Error as e:
+                logger.warning(f"⚠️ Error cerrando conexión: {e}")
+            self.disconnect()
     
     def get_calls_by_date_range(self, start_date: date, end_date: date, query: str = None) -> List[Dict[str, Any]]:
         """
@@ -55,46 +103,10 @@ class DatabaseManager:
                 return []
         
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            
-            if query:
-                # Si se proporciona una consulta personalizada, la usamos
-                cursor.execute(query, (start_date, end_date))
-            else:
-                # Consulta por defecto - ajustada para tu esquema de base de datos
-                # Ordenamiento robusto por fecha y hora para mantener secuencia cronológica
-                default_query = """
-                SELECT
-                    c.id AS id,
-                    c.started_at AS fecha_llamada,
-                    ca.user_type AS user_type,
-                    ca.audio_url AS audio_path,
-                    TIMESTAMPDIFF(SECOND, c.started_at, c.ended_at) AS duracion,
-                    c.company_id AS telefono_origen,
-                    c.branch_id AS telefono_destino,
-                    CASE 
-                        WHEN c.company_id IS NULL THEN 'No identificado'
-                        ELSE 'Identificado'
-                    END AS cliente_status,
-                    b.name AS sucursal,
-                    p.full_name AS atendido_por
-                FROM calls c
-                LEFT JOIN branches b ON b.id = c.branch_id
-                LEFT JOIN users u ON u.id = c.attended_by_employee_id
-                LEFT JOIN persons p ON p.id = u.person_id
-                LEFT JOIN call_audios ca ON ca.call_id = c.id
-                WHERE DATE(c.started_at) BETWEEN %s AND %s
-                  AND ca.audio_url IS NOT NULL
-                  AND ca.audio_url != ''
-                ORDER BY 
-                    c.started_at ASC,
-                    c.id ASC,
-                    ca.user_type ASC
-                """
-                cursor.execute(default_query, (start_date, end_date))
-            
+            cursor = self._execute_calls_query(start_date, end_date, query)
             results = cursor.fetchall()
-            cursor.close()
+            if cursor is not self._calls_cursor:
+                cursor.close()
             
             logger.info(f"Se encontraron {len(results)} llamadas entre {start_date} y {end_date}")
             return results
@@ -103,6 +115,140 @@ class DatabaseManager:
             logger.error(f"Error ejecutando consulta: {e}")
             return []
     
+    def iter_calls_by_date_range(self, start_date: date, end_date: date, query: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre las llamadas de un rango de fechas sin cargarlas todas en memoria
+        
+        El cursor no usa buffer: las filas se leen del servidor en bloques de
+        MYSQL_FETCH_SIZE a medida que se consumen. La conexión queda ocupada hasta
+        agotar el iterador.
+        
+        Args:
+            start_date: Fecha de inicio
+            end_date: Fecha de fin
+            query: Consulta SQL personalizada (opcional)
+        
+        Yields:
+            Diccionarios con la información de cada llamada
+        """
+        if not self.connection or not self.connection.is_connected():
+            if not self.connect():
+                return
+        
+        cursor = None
+        previous_timeout = None
+        exhausted = False
+        total = 0
+        try:
+            # El servidor espera a que se lean las filas pendientes mientras se
+            # transcribe cada bloque; se amplía el límite para que no corte la conexión.
+            # El pool no reinicia la sesión, así que se guarda el valor anterior
+            setup = self.connection.cursor()
+            setup.execute("SELECT @@SESSION.net_write_timeout")
+            (previous_timeout,) = setup.fetchone()
+            setup.execute("SET SESSION net_write_timeout = %s", (self.config.MYSQL_STREAM_TIMEOUT,))
+            setup.close()
+            
+            cursor = self._execute_calls_query(start_date, end_date, query)
+            fetch_size = max(1, self.config.MYSQL_FETCH_SIZE)
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                total += len(rows)
+                yield from rows
+            exhausted = True
+            
+            logger.info(f"Se recorrieron {total} llamadas entre {start_date} y {end_date}")
+            
+        except Error as e:
+            # Se propaga: un corte a mitad del rango no debe pasar por una lectura completa
+            logger.error(f"Error ejecutando consulta tras {total} llamadas: {e}")
+            raise
+        finally:
+            if cursor is not None and not exhausted:
+                # Iterador cerrado antes de tiempo (dry-run, error o abandono): leer el
+                # resto del rango solo para descartarlo costaría transferirlo entero.
+                # Se cierra la conexión; también se pierde el net_write_timeout ampliado
+                self._discard_connection()
+            else:
+                if cursor is not None and cursor is not self._calls_cursor:
+                    try:
+                        cursor.close()
+                    except Error as e:
+                        logger.warning(f"⚠️ Error cerrando cursor: {e}")
+                if previous_timeout is not None:
+                    try:
+                        # Restaurar el límite antes de que la conexión vuelva al pool
+                        restore = self.connection.cursor()
+                        restore.execute("SET SESSION net_write_timeout = %s", (previous_timeout,))
+                        restore.close()
+                    except Error as e:
+                        logger.warning(f"⚠️ Error restaurando net_write_timeout: {e}")
+    
+    def _execute_calls_query(self, start_date: date, end_date: date, query: str = None):
+        """Ejecuta la consulta de llamadas del rango y devuelve el cursor sin leer"""
+        if query:
+            # Si se proporciona una consulta personalizada, la usamos
+            cursor = self.connection.cursor(dictionary=True)
+            cursor.execute(query, (start_date, end_date))
+        else:
+            # Consulta por defecto - ajustada para tu esquema de base de datos
+            # Ordenamiento robusto por fecha y hora para mantener secuencia cronológica
+            # El rango se filtra sobre started_at sin envolverlo en DATE() para que
+            # MySQL pueda usar el índice (started_at, id) y leerlo ya ordenado
+            default_query = """
+            SELECT
+                c.id AS id,
+                c.started_at AS fecha_llamada,
+                ca.user_type AS user_type,
+                ca.audio_url AS audio_path,
+                TIMESTAMPDIFF(SECOND, c.started_at, c.ended_at) AS duracion
+            FROM calls c
+            LEFT JOIN call_audios ca ON ca.call_id = c.id
+            WHERE c.started_at >= %s
+              AND c.started_at < %s
+              AND ca.audio_url IS NOT NULL
+              AND ca.audio_url != ''
+            ORDER BY 
+                c.started_at ASC,
+                c.id ASC,
+                ca.user_type ASC
+            """
+            # Sentencia preparada: el servidor la analiza una vez y las filas
+            # llegan en protocolo binario (fechas y enteros sin conversión desde texto).
+            # El cursor se conserva mientras dure la conexión para no volver a prepararla
+            if self._calls_cursor is None:
+                self._calls_cursor = self.connection.cursor(prepared=True, dictionary=True)
+            cursor = self._calls_cursor
+            cursor.execute(default_query, (start_date, end_date + timedelta(days=1)))
+        return cursor
+    
+    def has_calls(self) -> bool:
+        """Indica si existe al menos una llamada con audio (se detiene en la primera fila)"""
+        if not self.connection or not self.connection.is_connected():
+            if not self.connect():
+                return False
+        
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT EXISTS(
+                    SELECT 1
+                    FROM calls c
+                    JOIN call_audios ca ON ca.call_id = c.id
+                    WHERE ca.audio_url IS NOT NULL
+                      AND ca.audio_url != ''
+                )
+            """)
+            (exists,) = cursor.fetchone()
+            cursor.close()
+            return bool(exists)
+            
+        except Error as e:
+            logger.error(f"Error verificando llamadas: {e}")
+            return False
+    
     def test_connection(self) -> bool:
         """Prueba la conexión a la base de datos"""
         try:
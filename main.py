@@ -7,24 +7,41 @@ Conecta a MySQL, descarga audios y los transcribe usando Whisper
 import argparse
 import sys
 from datetime import datetime, date
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterable
+import atexit
 import logging
-import json
+import logging.handlers
 import os
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+
+import orjson
+from mysql.connector import Error as MySQLError
 
 from database import DatabaseManager
 from audio_processor_client import AudioProcessorClient
 from config import Config
 
-# Configurar logging
+# Configurar logging: los registros se encolan y un hilo del QueueListener los
+# formatea y escribe en archivo y consola, fuera del hilo principal
+_log_queue = queue.SimpleQueue()
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_file_handler = logging.FileHandler('/app/logs/processing.log')
+_file_handler.setFormatter(_log_formatter)
+_stream_handler = logging.StreamHandler(sys.stdout)
+_stream_handler.setFormatter(_log_formatter)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('/app/logs/processing.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)],
+    # database.py ya llamó a basicConfig al importarse; reemplazar su handler
+    force=True
 )
+_log_listener = logging.handlers.QueueListener(_log_queue, _file_handler, _stream_handler)
+_log_listener.start()
+# Vaciar la cola antes de salir (también tras sys.exit)
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 def create_logs_directory():
@@ -70,6 +87,18 @@ def parse_arguments():
         help='Solo mostrar qué se procesaría sin ejecutar'
     )
     
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Leer las llamadas de MySQL por bloques mientras se procesan (sin cargarlas todas)'
+    )
+    
+    parser.add_argument(
+        '--verbose',
+        action='store_true',
+        help='Mostrar el detalle de configuración y de cada paso'
+    )
+    
     parser.add_argument(
         '--cleanup-audio',
         action='store_true',
@@ -86,15 +115,29 @@ def parse_arguments():
 
 def validate_date(date_string: str) -> date:
     """Valida y convierte una cadena de fecha"""
+    # YYYY-MM-DD por posición: evita el parser genérico de strptime en el caso habitual
+    if (len(date_string) == 10 and date_string[4] == '-' and date_string[7] == '-'
+            and date_string[:4].isdigit() and date_string[5:7].isdigit() and date_string[8:].isdigit()):
+        try:
+            return date(int(date_string[:4]), int(date_string[5:7]), int(date_string[8:]))
+        except ValueError:
+            pass
+    # strptime también acepta fechas sin ceros a la izquierda (2024-1-5)
     try:
         return datetime.strptime(date_string, '%Y-%m-%d').date()
     except ValueError:
         raise ValueError(f"Formato de fecha inválido: {date_string}. Use YYYY-MM-DD")
 
-def print_summary(results: List[Dict[str, Any]], start_date: date, end_date: date):
+def count_successful(results: List[Dict[str, Any]]) -> int:
+    """Cuenta los resultados exitosos (una sola pasada, compartida por reporte y código de salida)"""
+    return sum(1 for r in results if r['success'])
+
+def print_summary(results: List[Dict[str, Any]], start_date: date, end_date: date,
+                  successful: Optional[int] = None):
     """Imprime un resumen de los resultados"""
     total_calls = len(results)
-    successful = sum(1 for r in results if r['success'])
+    if successful is None:
+        successful = count_successful(results)
     failed = total_calls - successful
     
     print("\n" + "="*60)
@@ -114,21 +157,57 @@ def print_summary(results: List[Dict[str, Any]], start_date: date, end_date: dat
     
     print("="*60)
 
-def save_json_report(results: List[Dict[str, Any]], filename: str):
+def save_json_report(results: List[Dict[str, Any]], filename: str, successful: Optional[int] = None):
     """Guarda un reporte en formato JSON"""
+    if successful is None:
+        successful = count_successful(results)
     report = {
         'timestamp': datetime.now().isoformat(),
         'total_calls': len(results),
-        'successful': sum(1 for r in results if r['success']),
-        'failed': sum(1 for r in results if not r['success']),
+        'successful': successful,
+        'failed': len(results) - successful,
         'results': results
     }
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    # orjson serializa en C y produce UTF-8 directamente (sin escapar no-ASCII)
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str))
     
     logger.info(f"Reporte JSON guardado: {filename}")
 
+def save_results_log(results: List[Dict[str, Any]], filename: str) -> int:
+    """
+    Guarda una línea JSON por resultado y devuelve cuántos fueron exitosos
+    
+    El conteo se hace en la misma pasada que la serialización, así el reporte
+    y el código de salida no vuelven a recorrer los resultados.
+    """
+    successful = 0
+    lines = []
+    for result in results:
+        successful += bool(result['success'])
+        lines.append(orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE, default=str))
+    
+    # Serializadas con orjson y escritas de una vez
+    with open(filename, 'wb') as f:
+        f.write(b''.join(lines))
+    
+    return successful
+
+def fetch_calls(db_manager: DatabaseManager, start_date: date, end_date: date,
+                query: str = None, stream: bool = False) -> Optional[Iterable[Dict[str, Any]]]:
+    """
+    Conecta a la base de datos y obtiene las llamadas (None si no hay conexión)
+    
+    Con stream=True devuelve un iterador perezoso: la consulta se ejecuta al
+    empezar a consumirlo y las filas se leen por bloques.
+    """
+    if not db_manager.test_connection():
+        return None
+    if stream:
+        return db_manager.iter_calls_by_date_range(start_date, end_date, query)
+    return db_manager.get_calls_by_date_range(start_date, end_date, query)
+
 def main():
     """Función principal"""
     try:
@@ -137,6 +216,8 @@ def main():
         
         # Parsear argumentos
         args = parse_arguments()
+        if args.verbose:
+            logger.setLevel(logging.DEBUG)
         
         # Validar fechas
         start_date = validate_date(args.start_date)
@@ -149,6 +230,14 @@ def main():
         
         # Inicializar componentes
         db_manager = DatabaseManager()
+        
+        # La conexión a MySQL y la consulta de llamadas (PASOS 0.2 a 2) se ejecutan
+        # en segundo plano mientras se inicializa el cliente de audio; ambos esperan
+        # red y son independientes
+        startup_executor = ThreadPoolExecutor(max_workers=1)
+        calls_future = startup_executor.submit(fetch_calls, db_manager, start_date, end_date, args.query, args.stream)
+        startup_executor.shutdown(wait=False)
+        
         logger.info("🔍 PASO 0: Inicializando cliente de audio...")
         logger.info("⏳ Conectando al servicio de Whisper independiente...")
         
@@ -168,27 +257,33 @@ def main():
             logger.error(f"❌ Error inicializando procesador de audio: {e}")
             logger.error(f"🔧 Tipo de error: {type(e).__name__}")
             logger.error(f"🔧 Detalles: {str(e)}")
-            import traceback
             logger.error(f"🔧 Stack trace: {traceback.format_exc()}")
             sys.exit(1)
         
         # Logs detallados después de la inicialización
         logger.info("🔍 PASO 0.1: Verificando estado del servicio de Whisper...")
         service_info = audio_processor.get_service_info()
-        logger.info(f"📊 Estado del servicio:")
-        logger.info(f"  - Servicio disponible: {service_info.get('status') == 'healthy'}")
-        logger.info(f"  - Modelo cargado: {service_info.get('model_loaded', False)}")
-        logger.info(f"  - Modelo: {service_info.get('model_name', 'unknown')}")
-        logger.info(f"  - Configuración CPU: {audio_processor.config.CPU_OPTIMIZED}")
-        logger.info(f"  - Workers disponibles: {audio_processor.config.MAX_CPU_WORKERS}")
+        # Detalle solo con --verbose; el formato % se resuelve únicamente si se emite
+        logger.debug("📊 Estado del servicio:")
+        logger.debug("  - Servicio disponible: %s", service_info.get('status') == 'healthy')
+        logger.debug("  - Modelo cargado: %s", service_info.get('model_loaded', False))
+        logger.debug("  - Modelo: %s", service_info.get('model_name', 'unknown'))
+        logger.debug("  - Configuración CPU: %s", audio_processor.config.CPU_OPTIMIZED)
+        logger.debug("  - Workers disponibles: %s", audio_processor.config.MAX_CPU_WORKERS)
         
         # Log crítico para verificar que llegamos hasta aquí
-        logger.info("🔍 PASO 0.1.1: Verificando que el cliente está completamente inicializado...")
+        logger.debug("🔍 PASO 0.1.1: Verificando que el cliente está completamente inicializado...")
         logger.info("✅ PASO 0.1 COMPLETADO: Cliente verificado y listo")
         
         # Conectar a la base de datos
         logger.info("🔍 PASO 0.2: Conectando a la base de datos...")
-        if not db_manager.test_connection():
+        try:
+            calls_data = calls_future.result()
+        except Exception as e:
+            logger.error(f"❌ Error ejecutando consulta SQL: {e}")
+            logger.error("🔧 Verificar configuración de la base de datos")
+            sys.exit(1)
+        if calls_data is None:
             logger.error("❌ No se pudo conectar a la base de datos")
             logger.error("🔧 Verificar configuración de MySQL en .env")
             sys.exit(1)
@@ -196,42 +291,28 @@ def main():
         
         # Obtener llamadas del rango de fechas
         logger.info("🔍 PASO 1: Obteniendo llamadas de la base de datos...")
-        logger.info(f"📅 Rango de fechas: {start_date} a {end_date}")
-        logger.info(f"🔍 Query personalizada: {args.query if args.query else 'Ninguna'}")
-        
-        # Verificar conexión a la base de datos
-        logger.info("🔍 PASO 2: Verificando conexión a la base de datos...")
-        try:
-            if not db_manager.test_connection():
-                logger.error("❌ No se pudo conectar a la base de datos")
-                logger.error("🔧 Verificar configuración de MySQL en .env")
-                sys.exit(1)
-            logger.info("✅ Conexión a la base de datos exitosa")
-        except Exception as e:
-            logger.error(f"❌ Error verificando conexión a la base de datos: {e}")
-            sys.exit(1)
+        logger.debug("📅 Rango de fechas: %s a %s", start_date, end_date)
+        logger.debug("🔍 Query personalizada: %s", args.query or 'Ninguna')
         
-        logger.info("🔍 PASO 3: Ejecutando consulta SQL...")
-        try:
-            calls_data = db_manager.get_calls_by_date_range(
-                start_date, 
-                end_date, 
-                args.query
-            )
-            logger.info(f"📊 Consulta completada. Resultados: {len(calls_data) if calls_data else 0} llamadas")
-        except Exception as e:
-            logger.error(f"❌ Error ejecutando consulta SQL: {e}")
-            logger.error("🔧 Verificar configuración de la base de datos")
-            sys.exit(1)
+        logger.info("🔍 PASO 2: Ejecutando consulta SQL...")
+        if args.stream:
+            # Leer solo las primeras filas para la vista previa; el resto se
+            # consume por bloques durante el procesamiento
+            calls_iter = calls_data
+            preview = list(islice(calls_iter, 5))
+            calls_data = chain(preview, calls_iter)
+            logger.info("📊 Consulta en modo stream: las llamadas se leerán por bloques")
+        else:
+            preview = calls_data[:5]
+            logger.info(f"📊 Consulta completada. Resultados: {len(calls_data)} llamadas")
         
-        if not calls_data:
+        if not preview:
             logger.warning("No se encontraron llamadas en el rango de fechas especificado")
             logger.info("Verificando si hay llamadas en la base de datos...")
             
-            # Probar con un rango más amplio para verificar que hay datos
-            test_calls = db_manager.get_calls_by_date_range("2020-01-01", "2030-12-31", None)
-            if test_calls:
-                logger.info(f"Se encontraron {len(test_calls)} llamadas en total en la base de datos")
+            # Comprobar con EXISTS si hay alguna llamada con audio, sin traer filas
+            if db_manager.has_calls():
+                logger.info("Hay llamadas con audio en la base de datos")
                 logger.info("El problema puede ser que no hay llamadas en el rango específico")
             else:
                 logger.error("No se encontraron llamadas en la base de datos")
@@ -239,63 +320,79 @@ def main():
             
             sys.exit(0)
         
-        logger.info(f"Se encontraron {len(calls_data)} llamadas para procesar")
+        if not args.stream:
+            logger.info(f"Se encontraron {len(calls_data)} llamadas para procesar")
         
         # Verificar orden cronológico
         logger.info("Verificando orden cronológico de llamadas...")
-        for i, call in enumerate(calls_data[:3]):  # Mostrar las primeras 3
+        for i, call in enumerate(preview[:3]):  # Mostrar las primeras 3
             fecha = call.get('fecha_llamada', 'N/A')
             call_id = call.get('id', 'N/A')
             user_type = call.get('user_type', 'N/A')
             logger.info(f"  {i+1}. ID: {call_id}, Fecha: {fecha}, Tipo: {user_type}")
         
-        if len(calls_data) > 3:
+        if not args.stream and len(calls_data) > 3:
             logger.info(f"  ... y {len(calls_data) - 3} llamadas más en orden cronológico")
         
         # Modo dry-run
         if args.dry_run:
             logger.info("MODO DRY-RUN: Solo mostrando qué se procesaría")
-            for call in calls_data[:5]:  # Mostrar solo las primeras 5
+            for call in preview:  # Mostrar solo las primeras 5
                 print(f"ID: {call.get('id')}, Fecha: {call.get('fecha_llamada')}, "
                       f"User Type: {call.get('user_type')}, Audio: {call.get('audio_path')}")
-            if len(calls_data) > 5:
+            if args.stream:
+                # Cerrar ya el cursor: se descarta la conexión sin leer el resto del rango
+                calls_iter.close()
+            elif len(calls_data) > 5:
                 print(f"... y {len(calls_data) - 5} llamadas más")
             return
         
         # Procesar llamadas
-        logger.info("🔍 PASO 4: Iniciando procesamiento de audios...")
-        logger.info(f"🎯 Total de llamadas a procesar: {len(calls_data)}")
-        logger.info("🔧 Configuración del procesador:")
-        logger.info(f"  - Modelo Whisper: {audio_processor.config.WHISPER_MODEL}")
-        logger.info(f"  - Workers CPU: {audio_processor.config.MAX_CPU_WORKERS}")
-        logger.info(f"  - Limpieza automática: {audio_processor.config.AUTO_CLEANUP}")
-        logger.info(f"  - Optimización CPU: {audio_processor.config.CPU_OPTIMIZED}")
+        logger.info("🔍 PASO 3: Iniciando procesamiento de audios...")
+        if not args.stream:
+            logger.info(f"🎯 Total de llamadas a procesar: {len(calls_data)}")
+        logger.debug("🔧 Configuración del procesador:")
+        logger.debug("  - Modelo Whisper: %s", audio_processor.config.WHISPER_MODEL)
+        logger.debug("  - Workers CPU: %s", audio_processor.config.MAX_CPU_WORKERS)
+        logger.debug("  - Limpieza automática: %s", audio_processor.config.AUTO_CLEANUP)
+        logger.debug("  - Optimización CPU: %s", audio_processor.config.CPU_OPTIMIZED)
         
         logger.info("🚀 Iniciando procesamiento en lote...")
-        results = audio_processor.process_calls_batch(calls_data)
+        stream_interrupted = False
+        if args.stream:
+            results = []
+            try:
+                # extend conserva los resultados ya procesados si la lectura se corta
+                results.extend(audio_processor.process_calls_stream(calls_data))
+            except MySQLError as e:
+                stream_interrupted = True
+                logger.error(f"❌ Lectura de llamadas interrumpida: {e}")
+                logger.error(f"🔧 Procesamiento INCOMPLETO: solo {len(results)} llamadas del rango procesadas")
+        else:
+            results = audio_processor.process_calls_batch(calls_data)
         logger.info(f"✅ Procesamiento completado. Resultados: {len(results)} llamadas procesadas")
         
         # Cerrar conexión a la base de datos
         db_manager.disconnect()
         
+        # Guardar log de resultados; la misma pasada cuenta los exitosos
+        log_filename = f"/app/logs/procesamiento_{start_date}_{end_date}.log"
+        successful = save_results_log(results, log_filename)
+        
         # Generar reporte
         if args.output_format == 'json':
             report_filename = f"/app/logs/reporte_{start_date}_{end_date}.json"
-            save_json_report(results, report_filename)
+            save_json_report(results, report_filename, successful)
         else:
-            print_summary(results, start_date, end_date)
-        
-        # Guardar log de resultados
-        log_filename = f"/app/logs/procesamiento_{start_date}_{end_date}.log"
-        with open(log_filename, 'w', encoding='utf-8') as f:
-            for result in results:
-                f.write(f"{json.dumps(result, ensure_ascii=False, default=str)}\n")
+            print_summary(results, start_date, end_date, successful)
         
         logger.info(f"Procesamiento completado. Log guardado en: {log_filename}")
         
         # Código de salida basado en resultados
-        successful = sum(1 for r in results if r['success'])
-        if successful == len(results):
+        if stream_interrupted:
+            logger.error("❌ El rango no se procesó completo; volver a ejecutar para el resto")
+            sys.exit(1)  # Incompleto
+        elif successful == len(results):
             sys.exit(0)  # Todo exitoso
         elif successful > 0:
             sys.exit(1)  # Parcialmente exitoso
@@ -309,7 +406,6 @@ def main():
         logger.error(f"❌ Error inesperado: {e}")
         logger.error(f"🔧 Tipo de error: {type(e).__name__}")
         logger.error(f"🔧 Detalles del error: {str(e)}")
-        import traceback
         logger.error(f"🔧 Stack trace: {traceback.format_exc()}")
         logger.error("🔧 Verificar configuración y logs para más detalles")
         sys.exit(1)